@@ -2,17 +2,23 @@ import os
 import io
 import re
 import time
+import uuid
 import base64
+import binascii
 import random
+import hashlib
 import asyncio
-import traceback
+import contextlib
 import pdfplumber
 import httpx
+import orjson
 import logging
+import sys
 
-from typing import Dict, List, Optional
-from pydantic import BaseModel, Field
-from fastapi import FastAPI, HTTPException
+from typing import Dict, List, MutableSequence, Optional, Tuple
+from collections import OrderedDict, deque
+from pydantic import BaseModel, ConfigDict, Field
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from playwright.async_api import async_playwright, TimeoutError as PwTimeout
 
@@ -21,10 +27,14 @@ from playwright.async_api import async_playwright, TimeoutError as PwTimeout
 # --------------------------
 logger = logging.getLogger("auto-apply-playwright")
 if not logger.handlers:
-    handler = logging.StreamHandler()
+    # stdout, como o print original: no Railway é aí que os logs dos passos são recolhidos
+    handler = logging.StreamHandler(sys.stdout)
     handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
     logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+# Mensagens verbosas (excertos de respostas, dumps de instruções) só com DEBUG=1
+DEBUG = os.getenv("DEBUG", "").lower() in ("1", "true", "yes")
 
 # --------------------------
 # Classes de Gestão
@@ -47,6 +57,12 @@ class SmartRetrySystem:
         await asyncio.sleep(delay)
         return True
 
+retry_system = SmartRetrySystem()
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """Backoff exponencial com full jitter: tentativas concorrentes não voltam a colidir em lockstep"""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
 class ApplicationState:
     def __init__(self):
         self.current_step = "initial"
@@ -67,7 +83,7 @@ class ApplicationLogger:
     def __init__(self):
         self.performance_metrics = {}
         self.error_stats = {}
-        self.start_time = time.time()
+        self.start_time = time.perf_counter()
     def log_performance(self, step: str, duration: float):
         self.performance_metrics[step] = duration
     def log_error(self, error_type: str, details: str):
@@ -82,10 +98,57 @@ except ImportError:
     TWOCAPTCHA_AVAILABLE = False
     logger.warning("2captcha-python não disponível - resolução de CAPTCHA desabilitada")
 
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    logger.warning("Pillow não disponível - screenshots enviados ao Vision sem redimensionar")
+
+# --------------------------
+# Cliente HTTP partilhado
+# --------------------------
+def new_http_client() -> httpx.AsyncClient:
+    # Keep-alive + HTTP/2: evita handshake TCP/TLS por cada chamada à OpenAI / download de CV
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=30.0,
+        # keepalive_expiry: o default (5s) é menor que o intervalo entre chamadas Vision
+        # de uma mesma candidatura, o que voltava a pagar o handshake TLS em cada tentativa
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60.0),
+        follow_redirects=True,
+    )
+
+def get_http_client() -> httpx.AsyncClient:
+    client = getattr(app.state, "http", None)
+    if client is None or client.is_closed:
+        client = app.state.http = new_http_client()
+    return client
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.http = new_http_client()
+    if WEB_CONCURRENCY > 1:
+        logger.warning(
+            "⚠ WEB_CONCURRENCY=%d: /apply/log/{id} e a idempotência são por worker "
+            "(logs podem dar 404 e duplicados noutro worker não são detetados)",
+            WEB_CONCURRENCY,
+        )
+    # Arranca o browser já no startup para o primeiro /apply não pagar o launch do Chromium
+    try:
+        await get_browser([])
+    except Exception as e:
+        logger.warning("⚠ Browser não iniciado no startup (nova tentativa no primeiro pedido): %s", e)
+    try:
+        yield
+    finally:
+        await close_browser()
+        await app.state.http.aclose()
+
 # --------------------------
 # FastAPI app & CORS
 # --------------------------
-app = FastAPI(title="auto-apply-playwright", version="2.0")
+app = FastAPI(title="auto-apply-playwright", version="2.0", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -103,6 +166,10 @@ SUCCESS_HINTS = [
     "we will be in touch", "gracias", "candidatura enviada"
 ]
 
+# Sinais de erro/pendência (prevalecem sobre os de sucesso)
+ERROR_HINTS = ["please fill out this field", "required", "fix the errors", "invalid"]
+REQUIRED_HINTS = ["please fill out this field", "campo obrigatório", "required"]
+
 # --------------------------
 # Selectors genéricos
 # --------------------------
@@ -126,10 +193,82 @@ SELECTORS = {
     "required_any": "input[required], textarea[required], select[required], [aria-required='true']",
 }
 
+# Seletores já partidos em átomos: tenta-se cada um por ordem em vez de reprocessar a lista inteira
+SELECTORS_SPLIT = {k: tuple(s.strip() for s in v.split(",")) for k, v in SELECTORS.items()}
+SELECTOR_ATOMS = {SELECTORS[k]: atoms for k, atoms in SELECTORS_SPLIT.items()}
+
+# --------------------------
+# Regexes pré-compiladas
+# --------------------------
+# Parsing de CV
+RE_EMAIL = re.compile(r"[\w\.-]+@[\w\.-]+\.\w+")
+RE_PHONE = re.compile(r"(?:\+?\d{2,3}\s?)?(?:\d[\s\-]?){8,14}\d")
+RE_PHONE_CLEAN = re.compile(r"[^\d+]")
+RE_NAME = re.compile(r"^[A-ZÀ-Ú][A-Za-zÀ-ú'\-]+(?:\s+[A-ZÀ-Ú][A-Za-zÀ-ú'\-]+){1,2}$")
+RE_LOC = re.compile(r"portugal|lisboa|lisbon|porto|almada|setúbal|madrid|barcelona|spain|españa", re.IGNORECASE)
+
+# Deteção de sucesso
+RE_SUCCESS_HINTS = re.compile("|".join(re.escape(h) for h in SUCCESS_HINTS), re.IGNORECASE)
+
+# Resposta e instruções do Vision
+RE_JSON_OBJECT = re.compile(r'\{[\s\S]*\}')
+RE_QUOTED = re.compile(r"['\"](.+?)['\"]")
+RE_CAPTCHA_POS = re.compile(r"position\s*\((\d+),\s*(\d+)\)")
+RE_SELECT_DROPDOWN = re.compile(r"select option ['\"](.+?)['\"] in dropdown\s*(?:\[name=['\"](.+?)['\"]\]|['\"](.+?)['\"])", re.IGNORECASE)
+RE_FILL = re.compile(r"fill\s+(.+?)\s+with\s+(?:value\s+)?['\"](.+?)['\"]", re.IGNORECASE)
+RE_CLICK = re.compile(r"click\s+(.+)", re.IGNORECASE)
+RE_SELECT = re.compile(r"select\s+(?:option\s+)?['\"](.+?)['\"]\s+in\s+(.+)", re.IGNORECASE)
+RE_CHECK = re.compile(r"check\s+(.+)", re.IGNORECASE)
+RE_SUBMIT = re.compile("submit", re.IGNORECASE)
+
+# --------------------------
+# Admissão / concorrência
+# --------------------------
+# Limita quantas candidaturas correm em simultâneo por worker (cada uma abre um contexto no browser)
+APPLY_CONCURRENCY = int(os.getenv("APPLY_CONCURRENCY", "2"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10"))
+# Prazo total de uma candidatura; ao expirar é cancelada e o contexto fechado
+APPLY_TIMEOUT_S = float(os.getenv("APPLY_TIMEOUT_S", "300"))
+apply_semaphore = asyncio.Semaphore(APPLY_CONCURRENCY)
+# Logs de falha, cache de idempotência e pedidos em curso vivem na memória de cada processo
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# --------------------------
+# Logs de candidaturas falhadas
+# --------------------------
+# Em caso de falha a resposta leva só as últimas linhas; o log completo fica aqui (in-memory, TTL)
+FAILED_LOG_TTL_S = 600
+FAILED_LOG_TAIL = 5
+FAILED_LOGS: Dict[str, tuple] = {}
+
+def store_failed_log(log: List[str]) -> str:
+    now = time.monotonic()
+    for rid in [k for k, (ts, _) in FAILED_LOGS.items() if now - ts > FAILED_LOG_TTL_S]:
+        FAILED_LOGS.pop(rid, None)
+    rid = uuid.uuid4().hex
+    FAILED_LOGS[rid] = (now, log)
+    return rid
+
+# --------------------------
+# Idempotência
+# --------------------------
+# Pedidos repetidos (retries do cliente / duplo submit) devolvem o resultado anterior em vez de re-candidatar
+IDEMPOTENCY_TTL_S = int(os.getenv("IDEMPOTENCY_TTL_S", "600"))
+IDEMPOTENCY_CACHE: Dict[str, tuple] = {}
+INFLIGHT_APPLIES: Dict[str, tuple] = {}
+
+def cache_apply_result(key: str, fingerprint: str, payload: Dict):
+    now = time.monotonic()
+    for k in [k for k, (ts, _, _) in IDEMPOTENCY_CACHE.items() if now - ts > IDEMPOTENCY_TTL_S]:
+        IDEMPOTENCY_CACHE.pop(k, None)
+    IDEMPOTENCY_CACHE[key] = (now, fingerprint, payload)
+
 # --------------------------
 # Modelos
 # --------------------------
 class ApplyRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True, frozen=True)
+
     job_url: str
     full_name: Optional[str] = ""
     email: Optional[str] = ""
@@ -144,15 +283,46 @@ class ApplyRequest(BaseModel):
     resume_b64: Optional[str] = None
     plan_only: bool = False
     allow_submit: bool = True
+    humanize: bool = True
     openai_api_key: Optional[str] = None
 
+class BatchRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
+    # Limite validado antes dos itens: um batch grande é rejeitado sem validar os resume_b64 todos
+    requests: List[ApplyRequest] = Field(..., max_length=MAX_BATCH_SIZE)
+
 # --------------------------
 # Helpers
 # --------------------------
-def log_message(messages: List[str], msg: str):
-    timestamp = time.strftime("%H:%M:%S")
-    print(f"[{timestamp}] {msg}", flush=True)
-    messages.append(f"[{timestamp}] {msg}")
+# Timestamp HH:MM:SS reaproveitado dentro do mesmo segundo (evita strftime a cada mensagem)
+_last_ts_sec = 0
+_last_ts_str = ""
+
+# Limite de linhas guardadas por candidatura (as mais antigas são descartadas)
+MAX_LOG_ENTRIES = int(os.getenv("MAX_LOG_ENTRIES", "200"))
+
+def new_log() -> deque:
+    return deque(maxlen=MAX_LOG_ENTRIES)
+
+def log_message(messages: MutableSequence[str], msg: str, *args):
+    """Regista uma linha; com args o msg é um template %-style formatado só aqui"""
+    global _last_ts_sec, _last_ts_str
+    if args:
+        msg = msg % args
+    now = int(time.time())
+    if now != _last_ts_sec:
+        _last_ts_sec = now
+        _last_ts_str = time.strftime("%H:%M:%S", time.localtime(now))
+    line = f"[{_last_ts_str}] {msg}"
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(line)
+    messages.append(line)
+
+def log_debug(messages: MutableSequence[str], msg: str, *args):
+    """Linhas de baixo sinal: só registadas (e formatadas) com DEBUG=1"""
+    if DEBUG:
+        log_message(messages, msg, *args)
 
 def extract_from_pdf_bytes(pdf_bytes: bytes) -> Dict[str, str]:
     out: Dict[str, str] = {}
@@ -161,39 +331,53 @@ def extract_from_pdf_bytes(pdf_bytes: bytes) -> Dict[str, str]:
             text = "\n".join([p.extract_text() or "" for p in pdf.pages])
         # Guardar texto bruto para usar em prompts da Vision
         out["__text"] = text
-        email = re.search(r"[\w\.-]+@[\w\.-]+\.\w+", text)
-        phone = re.search(r"(?:\+?\d{2,3}\s?)?(?:\d[\s\-]?){8,14}\d", text)
+        email = RE_EMAIL.search(text)
+        phone = RE_PHONE.search(text)
         lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
         name = None
         for ln in lines[:15]:
-            if re.match(r"^[A-ZÀ-Ú][A-Za-zÀ-ú'\-]+(?:\s+[A-ZÀ-Ú][A-Za-zÀ-ú'\-]+){1,2}$", ln):
+            if RE_NAME.match(ln):
                 name = ln
                 break
-        loc = None
-        for ln in lines:
-            if any(k in ln.lower() for k in ["portugal", "lisboa", "lisbon", "porto", "almada", "setúbal", "madrid", "barcelona", "spain", "españa"]):
-                loc = ln
-                break
+        loc = next((ln for ln in lines if RE_LOC.search(ln)), None)
         if name: out["full_name"] = name
         if email: out["email"] = email.group(0)
-        if phone: out["phone"] = re.sub(r"[^\d+]", "", phone.group(0))
+        if phone: out["phone"] = RE_PHONE_CLEAN.sub("", phone.group(0))
         if loc: out["location"] = loc
     except Exception:
         pass
     return out
 
+CV_PARSE_CACHE_SIZE = 64
+_cv_parse_cache: "OrderedDict[bytes, Dict[str, str]]" = OrderedDict()
+
+async def parse_resume(pdf_bytes: bytes) -> Dict[str, str]:
+    """Extrai dados do CV com cache LRU por hash (o mesmo CV é usado em várias candidaturas)"""
+    key = hashlib.blake2b(pdf_bytes, digest_size=16).digest()
+    cached = _cv_parse_cache.get(key)
+    if cached is not None:
+        _cv_parse_cache.move_to_end(key)
+        return dict(cached)
+    # pdfplumber é CPU puro: corre numa thread para não bloquear o event loop
+    extracted = await asyncio.to_thread(extract_from_pdf_bytes, pdf_bytes)
+    _cv_parse_cache[key] = extracted
+    if len(_cv_parse_cache) > CV_PARSE_CACHE_SIZE:
+        _cv_parse_cache.popitem(last=False)
+    return dict(extracted)
+
 async def load_resume_bytes(resume_url: Optional[str], resume_b64: Optional[str]) -> Optional[bytes]:
     if resume_b64:
         try:
-            return base64.b64decode(resume_b64)
+            # Aceita data URLs ("data:application/pdf;base64,...") enviadas por browsers
+            raw = resume_b64.split(",", 1)[1] if resume_b64.startswith("data:") else resume_b64
+            return binascii.a2b_base64(raw)
         except Exception:
             return None
     if resume_url:
         try:
-            async with httpx.AsyncClient(timeout=20.0, follow_redirects=True) as client:
-                r = await client.get(resume_url)
-                r.raise_for_status()
-                return r.content
+            r = await get_http_client().get(resume_url, timeout=20.0)
+            r.raise_for_status()
+            return r.content
         except Exception:
             return None
     return None
@@ -248,10 +432,9 @@ async def human_click(page, selector: str, messages: List[str]) -> bool:
         pass
     return False
 
-async def human_type(page, selector: str, text: str, messages: List[str]) -> bool:
-    """Digita texto como um humano (com erros e correções)"""
+async def human_type(element, text: str, messages: List[str]) -> bool:
+    """Digita texto como um humano (com erros e correções) no locator já resolvido"""
     try:
-        element = page.locator(selector).first
         await element.click()
         await asyncio.sleep(random.uniform(0.2, 0.5))
         if random.random() < 0.3:
@@ -311,7 +494,8 @@ async def human_reading_behavior(page, messages: List[str]):
         pass
 
 class HumanTiming:
-    def __init__(self):
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
         self.think_times = {
             "simple_field": (0.3, 1.2),
             "complex_field": (0.8, 2.0),
@@ -319,10 +503,14 @@ class HumanTiming:
             "review": (2.0, 5.0)
         }
     async def think(self, field_type: str = "simple_field"):
+        if not self.enabled:
+            return
         min_time, max_time = self.think_times.get(field_type, (0.5, 1.5))
         think_time = random.uniform(min_time, max_time)
         await asyncio.sleep(think_time)
     async def random_break(self):
+        if not self.enabled:
+            return
         if random.random() < 0.08:
             await asyncio.sleep(random.uniform(2.0, 5.0))
         elif random.random() < 0.25:
@@ -331,41 +519,221 @@ class HumanTiming:
 # --------------------------
 # Playwright helpers
 # --------------------------
+# Chromium partilhado (sidecar com --remote-debugging-port); se vazio, cada request lança o seu
+BROWSER_CDP_URL = os.getenv("BROWSER_CDP_URL", "")
+
+# Argumentos anti-detecção de bot e CAPTCHA
+BROWSER_ARGS = [
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-blink-features=AutomationControlled",
+    "--disable-web-security",
+    "--disable-features=IsolateOrigins,site-per-process",
+    "--disable-infobars",
+    "--window-size=1920,1080",
+    "--start-maximized",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-sync",
+    "--mute-audio"
+]
+
+# Recursos que não ajudam a detetar/preencher formulários (stylesheets ficam: visibilidade e validação dependem de CSS)
+BLOCKED_RESOURCE_TYPES = frozenset(
+    t.strip() for t in os.getenv("BLOCKED_RESOURCE_TYPES", "image,media,font").split(",") if t.strip()
+)
+
+async def block_heavy_resources(route):
+    request = route.request
+    # CAPTCHAs de imagem precisam das imagens para serem resolvidos
+    if request.resource_type in BLOCKED_RESOURCE_TYPES and "captcha" not in request.url:
+        await route.abort()
+    else:
+        await route.continue_()
+
+SCREENSHOT_QUALITY = 70
+VISION_SCREENSHOT_QUALITY = 75
+
+async def capture_screenshot(page, full_page: bool = True, quality: int = SCREENSHOT_QUALITY) -> bytes:
+    """Captura screenshot em JPEG (codificação e tamanho muito menores que PNG)"""
+    return await page.screenshot(type="jpeg", quality=quality, full_page=full_page)
+
+def encode_b64(img: bytes) -> str:
+    """Base64 ASCII de um screenshot ("" se vazio); feito só na fronteira (resposta/Vision)"""
+    return base64.b64encode(img).decode("ascii") if img else ""
+
+async def launch_browser(p, messages: List[str]):
+    """Liga-se ao Chromium partilhado via CDP (se configurado) ou lança um browser local"""
+    if BROWSER_CDP_URL:
+        try:
+            browser = await p.chromium.connect_over_cdp(BROWSER_CDP_URL)
+            log_message(messages, "✓ Ligado ao Chromium partilhado via CDP")
+            return browser
+        except Exception as e:
+            log_message(messages, f"⚠ Falha ao ligar via CDP ({e}) - a lançar browser local")
+    return await p.chromium.launch(headless=True, args=BROWSER_ARGS)
+
+_browser_lock = asyncio.Lock()
+
+async def get_browser(messages: List[str]):
+    """Devolve o browser do processo, (re)arrancando Playwright + Chromium se necessário"""
+    browser = getattr(app.state, "browser", None)
+    if browser is not None and browser.is_connected():
+        return browser
+    async with _browser_lock:
+        browser = getattr(app.state, "browser", None)
+        if browser is None or not browser.is_connected():
+            if browser is not None:
+                log_message(messages, "⚠ Browser partilhado desligado - a relançar")
+            if getattr(app.state, "pw", None) is None:
+                app.state.pw = await async_playwright().start()
+            app.state.browser = await launch_browser(app.state.pw, messages)
+            log_message(messages, "✓ Browser partilhado iniciado")
+    return app.state.browser
+
+async def close_browser():
+    browser = getattr(app.state, "browser", None)
+    pw = getattr(app.state, "pw", None)
+    app.state.browser = None
+    app.state.pw = None
+    if browser is not None:
+        try:
+            await browser.close()
+        except Exception:
+            pass
+    if pw is not None:
+        try:
+            await pw.stop()
+        except Exception:
+            pass
+
+async def close_context(context):
+    """Fecha o contexto sem deixar uma falha no close (ex: browser já morto) mascarar o resultado"""
+    try:
+        await context.close()
+    except Exception as e:
+        logger.warning("⚠ Falha ao fechar contexto: %s", e)
+
+# Primeiro elemento visível, percorrendo os átomos por ordem de prioridade: [índice do átomo, índice do match]
+FIRST_VISIBLE_JS = """
+(atoms) => {
+    for (let i = 0; i < atoms.length; i++) {
+        let els;
+        try {
+            els = document.querySelectorAll(atoms[i]);
+        } catch (e) {
+            continue;
+        }
+        for (let j = 0; j < els.length; j++) {
+            const el = els[j];
+            if (el.getClientRects().length && getComputedStyle(el).visibility !== 'hidden') return [i, j];
+        }
+    }
+    return null;
+}
+"""
+
+async def resolve_visible_selector(page, selector: str) -> Optional[Tuple[str, object]]:
+    """Devolve (átomo, locator) do primeiro átomo visível do seletor (pela ordem de prioridade em SELECTORS), ou None"""
+    atoms = SELECTOR_ATOMS.get(selector, (selector,))
+    try:
+        hit = await page.evaluate(FIRST_VISIBLE_JS, list(atoms))
+    except Exception:
+        return None
+    if not hit:
+        return None
+    atom_idx, match_idx = hit
+    atom = atoms[atom_idx]
+    return atom, page.locator(atom).nth(match_idx)
+
 async def fill_field(page, selector: str, value: str, messages: List[str], human: bool = True) -> bool:
     if not value:
         return False
     try:
-        loc = page.locator(selector).first
-        await loc.wait_for(state="visible", timeout=8000)
-        if await loc.is_visible():
-            await loc.scroll_into_view_if_needed()
-            if human and random.random() < 0.7:
-                if await human_type(page, selector, value, messages):
-                    log_message(messages, f"✓ Digitou {selector[:45]} -> '{value[:42]}'")
-                    await asyncio.sleep(random.uniform(0.3, 0.9))
-                    return True
-            await loc.fill(value)
-            log_message(messages, f"✓ Preencheu {selector[:45]} -> '{value[:42]}'")
+        # Campo já visível (caso comum): dispensa o wait_for e o seu polling
+        resolved = await resolve_visible_selector(page, selector)
+        if resolved is None:
+            sel, loc = selector, page.locator(selector).first
+            await loc.wait_for(state="visible", timeout=8000)
+        else:
+            sel, loc = resolved
+        await loc.scroll_into_view_if_needed()
+        if human and random.random() < 0.7:
+            if await human_type(loc, value, messages):
+                log_message(messages, f"✓ Digitou {sel[:45]} -> '{value[:42]}'")
+                await asyncio.sleep(random.uniform(0.3, 0.9))
+                return True
+        await loc.fill(value)
+        log_message(messages, f"✓ Preencheu {sel[:45]} -> '{value[:42]}'")
+        if human:
             await asyncio.sleep(random.uniform(0.3, 0.7))
-            return True
+        return True
     except Exception as e:
         log_message(messages, f"✗ Falha fill {selector[:40]}: {e}")
     return False
 
+# Preenche vários inputs simples num só round-trip: primeiro átomo visível de cada campo,
+# setter nativo do value (para inputs controlados por React) + eventos input/change
+FILL_BATCH_JS = """
+(fills) => {
+    const done = [];
+    for (const [key, atoms, value] of fills) {
+        let el = null;
+        for (const sel of atoms) {
+            try {
+                el = [...document.querySelectorAll(sel)].find(e => e.offsetParent !== null && !e.disabled && !e.readOnly);
+            } catch (e) {
+                el = null;
+            }
+            if (el) break;
+        }
+        if (!el) continue;
+        const proto = el instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+        el.focus();
+        Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, value);
+        // O setter guarda "" se o texto não for válido para o tipo (ex: "50k€" num type=number)
+        if (el.value !== value) continue;
+        el.dispatchEvent(new Event('input', {bubbles: true}));
+        el.dispatchEvent(new Event('change', {bubbles: true}));
+        done.push(key);
+    }
+    return done;
+}
+"""
+
+async def fill_fields_batch(page, values: Dict[str, str], messages: List[str]) -> List[str]:
+    """Preenche os campos SELECTORS[key] num só evaluate; devolve as keys (com valor) que ficaram por preencher"""
+    fills = [[key, SELECTORS_SPLIT[key], value] for key, value in values.items() if value]
+    if not fills:
+        return []
+    try:
+        done = set(await page.evaluate(FILL_BATCH_JS, fills))
+    except Exception as e:
+        log_message(messages, f"⚠ Preenchimento em lote falhou: {e}")
+        done = set()
+    for key, _, value in fills:
+        if key in done:
+            log_message(messages, f"✓ Preencheu {key} -> '{value[:42]}'")
+    return [key for key, _, _ in fills if key not in done]
+
 async def fill_autocomplete(page, selector: str, value: str, messages: List[str]) -> bool:
     if not value:
         return False
     try:
-        loc = page.locator(selector).first
-        await loc.wait_for(state="visible", timeout=2500)
-        if await loc.is_visible():
-            await loc.click()
-            await loc.fill(value)
-            await asyncio.sleep(random.uniform(0.4, 0.8))
-            await page.keyboard.press("ArrowDown")
-            await page.keyboard.press("Enter")
-            log_message(messages, f"✓ Auto-complete: {value}")
-            return True
+        resolved = await resolve_visible_selector(page, selector)
+        if resolved is None:
+            loc = page.locator(selector).first
+            await loc.wait_for(state="visible", timeout=2500)
+        else:
+            _, loc = resolved
+        await loc.click()
+        await loc.fill(value)
+        await asyncio.sleep(random.uniform(0.4, 0.8))
+        await page.keyboard.press("ArrowDown")
+        await page.keyboard.press("Enter")
+        log_message(messages, f"✓ Auto-complete: {value}")
+        return True
     except Exception as e:
         log_message(messages, f"✗ Falha autocomplete {selector[:40]}: {e}")
     return False
@@ -374,14 +742,12 @@ async def upload_resume(page, pdf_bytes: Optional[bytes], messages: List[str]) -
     if not pdf_bytes:
         return False
     try:
-        tmp_path = "/tmp/_resume.pdf"
-        with open(tmp_path, "wb") as f:
-            f.write(pdf_bytes)
         file_input = page.locator(SELECTORS["resume_file"]).first
         if await file_input.count() == 0:
             file_input = page.locator("input[type='file']").first
         if await file_input.count() > 0:
-            await file_input.set_input_files(tmp_path)
+            # Bytes em memória via CDP: sem ficheiro temporário partilhado entre pedidos concorrentes
+            await file_input.set_input_files(files={"name": "resume.pdf", "mimeType": "application/pdf", "buffer": pdf_bytes})
             log_message(messages, "✓ Currículo carregado")
             return True
         log_message(messages, "⚠ Nenhum input[type=file] encontrado")
@@ -396,25 +762,67 @@ async def try_open_apply_modal(page, messages: List[str]):
         if await btn.is_visible():
             await btn.click()
             log_message(messages, "✓ Abriu formulário Apply")
-            await asyncio.sleep(1.0)
+            # Esperar que o formulário apareça (campo de email) em vez de um sleep fixo
+            try:
+                await page.locator(SELECTORS["email"]).first.wait_for(state="visible", timeout=5000)
+            except PwTimeout:
+                pass
     except Exception:
         pass
 
-async def check_required_errors(page, messages: List[str]) -> List[str]:
-    problems = []
+async def find_text_hits(page, needles: List[str]) -> List[str]:
+    """Procura os textos no innerText dentro do browser, sem trazer o HTML inteiro pelo CDP"""
     try:
-        invalids = page.locator(":invalid")
-        n = await invalids.count()
-        for i in range(min(n, 10)):
-            el = invalids.nth(i)
-            name = await el.get_attribute("name")
-            problems.append(f"invalid:{name or '?'}")
+        return await page.evaluate(
+            "(needles) => { const t = (document.body ? document.body.innerText : '').toLowerCase(); return needles.filter(n => t.includes(n)); }",
+            needles,
+        )
     except Exception:
-        pass
-    html = (await page.content()).lower()
-    for needle in ["please fill out this field", "campo obrigatório", "required"]:
-        if needle in html:
-            problems.append(f"text:{needle}")
+        return []
+
+# Estado da página lido num só evaluate: textos de erro/sucesso + nomes dos campos :invalid
+PAGE_STATE_HINTS = list(dict.fromkeys(ERROR_HINTS + REQUIRED_HINTS + SUCCESS_HINTS))
+PAGE_STATE_JS = """
+(hints) => {
+    const text = (document.body ? document.body.innerText : '').toLowerCase();
+    return {
+        hits: hints.filter(h => text.includes(h)),
+        invalids: [...document.querySelectorAll(':invalid')].slice(0, 10).map(e => e.getAttribute('name')),
+    };
+}
+"""
+
+async def read_page_state(page) -> Dict:
+    """Tudo o que check_required_errors e detect_success precisam, num só round-trip CDP"""
+    try:
+        return await page.evaluate(PAGE_STATE_JS, PAGE_STATE_HINTS)
+    except Exception:
+        return {"hits": [], "invalids": []}
+
+def validation_problems(state: Dict) -> List[str]:
+    problems = [f"invalid:{name or '?'}" for name in state["invalids"]]
+    problems.extend(f"text:{needle}" for needle in REQUIRED_HINTS if needle in state["hits"])
+    return problems
+
+# Só elementos: textos como "required" aparecem em labels estáticos e nunca desapareceriam
+VALIDATION_SETTLED_JS = """
+() => !document.querySelector(':invalid, [aria-invalid="true"], .field-error')
+"""
+
+async def wait_validation_settled(page, timeout: int = 1500) -> bool:
+    """Espera (polling no browser) até não haver campos inválidos/marcados com erro"""
+    try:
+        await page.wait_for_function(VALIDATION_SETTLED_JS, timeout=timeout)
+        return True
+    except PwTimeout:
+        return False
+    except Exception:
+        return False
+
+async def check_required_errors(page, messages: List[str], state: Optional[Dict] = None) -> List[str]:
+    if state is None:
+        state = await read_page_state(page)
+    problems = validation_problems(state)
     if problems:
         log_message(messages, f"⚠ Problemas de validação: {problems}")
     return problems
@@ -423,7 +831,7 @@ async def fill_by_possible_labels(page, labels: List[str], value: str, messages:
     """Tenta preencher campo por vários labels possíveis com comportamento humano"""
     if not value:
         return False
-    timing = HumanTiming()
+    timing = HumanTiming(enabled=human)
     for lb in labels:
         try:
             el = page.get_by_label(lb)
@@ -710,6 +1118,20 @@ async def solve_audio_captcha(page, messages: List[str]) -> bool:
         pass
     return False
 
+# Presença de CAPTCHA (reCAPTCHA, hCaptcha ou imagem simples) num só evaluate
+CAPTCHA_PRESENT_JS = """
+() => !!document.querySelector(
+    'iframe[src*="recaptcha"], iframe[src*="hcaptcha"], .g-recaptcha, .h-captcha, [data-sitekey], '
+    + 'img[src*="captcha"], .simple-captcha, #captcha-image'
+)
+"""
+
+async def has_captcha(page) -> bool:
+    try:
+        return bool(await page.evaluate(CAPTCHA_PRESENT_JS))
+    except Exception:
+        return False
+
 async def solve_captcha_improved(page, messages: List[str]) -> bool:
     """Versão melhorada com fallbacks"""
     log_message(messages, "🛡️ Iniciando resolução de CAPTCHA...")
@@ -838,12 +1260,12 @@ async def solve_captcha(page, messages: List[str]) -> bool:
                     url=page.url
                 )
             
-            log_message(messages, f"✓ Resposta recebida do 2captcha: {str(result)[:100]}...")
+            if DEBUG:
+                log_message(messages, f"✓ Resposta recebida do 2captcha: {str(result)[:100]}...")
         except Exception as solver_error:
             log_message(messages, f"❌ [ERRO] Falha ao chamar API 2captcha: {type(solver_error).__name__}")
             log_message(messages, f"   Mensagem: {str(solver_error)[:150]}")
-            import traceback
-            log_message(messages, f"   Traceback: {traceback.format_exc()[:300]}")
+            logger.warning("Falha na API 2captcha", exc_info=True)
             return False
         
         response_token = result.get('code')
@@ -925,13 +1347,43 @@ async def solve_captcha(page, messages: List[str]) -> bool:
         log_message(messages, f"❌ ❌ ❌ [EXCEÇÃO CRÍTICA] ❌ ❌ ❌")
         log_message(messages, f"Tipo: {type(e).__name__}")
         log_message(messages, f"Mensagem: {str(e)[:200]}")
-        import traceback
-        tb = traceback.format_exc()
-        log_message(messages, f"Traceback completo:")
-        for line in tb.split('\n')[:15]:  # Primeiras 15 linhas
-            log_message(messages, f"  {line}")
+        # Stack trace só no logger do servidor, não no log devolvido ao cliente
+        logger.exception("Exceção na resolução de CAPTCHA")
         return False
 
+# "low" = imagem única 512px (poucos tokens); "high"/"auto" para formulários com texto muito pequeno
+VISION_IMAGE_DETAIL = os.getenv("VISION_IMAGE_DETAIL", "low")
+
+# Lado maior (px) da imagem enviada ao Vision; acima disto só se pagam mais tokens/latência
+VISION_MAX_SIDE = 1024
+
+# Limite de chamadas Vision em simultâneo por worker + jitter inicial, para que
+# candidaturas paralelas não disparem o Vision em lockstep (e em 429s)
+# (abaixo de APPLY_CONCURRENCY: cada candidatura só tem uma chamada Vision de cada vez,
+# por isso um limite igual nunca bloquearia)
+VISION_CONCURRENCY = int(os.getenv("VISION_CONCURRENCY", str(max(1, APPLY_CONCURRENCY // 2))))
+VISION_STAGGER_S = float(os.getenv("VISION_STAGGER_S", "0.5"))
+vision_semaphore = asyncio.Semaphore(VISION_CONCURRENCY)
+
+def prepare_vision_payload(img_bytes: bytes) -> str:
+    """Reduz o screenshot a VISION_MAX_SIDE px, re-encoda em JPEG e devolve base64 para o Vision"""
+    if PIL_AVAILABLE:
+        try:
+            img = Image.open(io.BytesIO(img_bytes))
+            img.thumbnail((VISION_MAX_SIDE, VISION_MAX_SIDE), Image.LANCZOS)
+            out = io.BytesIO()
+            img.convert("RGB").save(out, "JPEG", quality=VISION_SCREENSHOT_QUALITY)
+            img_bytes = out.getvalue()
+        except Exception:
+            pass
+    return encode_b64(img_bytes)
+
+# Campos do utilizador enviados ao Vision como contexto
+VISION_KNOWN_FIELDS = frozenset({
+    "full_name", "email", "phone", "location", "current_company",
+    "current_location", "salary_expectations", "notice_period"
+})
+
 async def analyze_screenshot_with_vision(screenshot_b64: str, messages: List[str], openai_key: Optional[str] = None, cv_text: Optional[str] = None, user_data: Optional[Dict[str, str]] = None) -> Dict:
     """
     Envia screenshot + contexto do CV para GPT Vision e recebe análise:
@@ -943,6 +1395,8 @@ async def analyze_screenshot_with_vision(screenshot_b64: str, messages: List[str
         log_message(messages, "⚠ OPENAI_API_KEY não fornecida - pulando Vision")
         return {"success": False, "reason": "API key not provided", "instructions": []}
     
+    await asyncio.sleep(random.uniform(0, VISION_STAGGER_S))
+    await vision_semaphore.acquire()
     try:
         log_message(messages, "🔍 Analisando screenshot com GPT-5 Vision...")
         # Compactar CV text para não estourar tokens
@@ -950,25 +1404,24 @@ async def analyze_screenshot_with_vision(screenshot_b64: str, messages: List[str
         if cv_text:
             trimmed = cv_text.strip()
             cv_excerpt = trimmed[:4000]  # suficiente
-        known_fields = {k: v for k, v in (user_data or {}).items() if k in [
-            "full_name","email","phone","location","current_company","current_location","salary_expectations","notice_period"
-        ] and v}
+        known_fields = {k: v for k, v in (user_data or {}).items() if k in VISION_KNOWN_FIELDS and v}
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {openai_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "gpt-4o",
-                    "temperature": 0.3,
-                    "max_tokens": 800,
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": """You are an AI that analyzes job application screenshots. Return STRICT JSON (no markdown fences).
+        client = get_http_client()
+        response = await client.post(
+            "https://api.openai.com/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {openai_key}",
+                "Content-Type": "application/json"
+            },
+            # orjson serializa direto para bytes (o screenshot base64 domina o tamanho do body)
+            content=orjson.dumps({
+                "model": "gpt-4o",
+                "temperature": 0.3,
+                "max_tokens": 800,
+                "messages": [
+                    {
+                        "role": "system",
+                        "content": """You are an AI that analyzes job application screenshots. Return STRICT JSON (no markdown fences).
 
 FORMAT:
 {
@@ -987,91 +1440,99 @@ RULES:
 - Derive all values from CV when fields empty
 - actions: fill, select, check, click
 - Always infer job_title, legal_name, city from CV"""
-                        },
-                        {
-                            "role": "user",
-                            "content": [
-                                {"type": "text", "text": (
-                                    "Analyze this job application screenshot. Decide if submission succeeded. "
-                                    "If not, generate precise Playwright-friendly instructions using label-based selectors. "
-                                    "ALWAYS provide values derived from the CV when a field is empty (e.g., job title, legal name, city, phone, email). "
-                                    "Known fields: " + str(known_fields) + "\n\nCV Text (may be truncated):\n" + (cv_excerpt or "")
-                                )},
-                                {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{screenshot_b64}"}}
-                            ]
-                        }
-                    ]
-                }
-            )
-            
-            if response.status_code != 200:
-                error_text = response.text
-                log_message(messages, f"✗ Vision API error: {response.status_code}")
-                log_message(messages, f"✗ Response: {error_text[:200]}")
-                return {"success": False, "reason": "API error", "instructions": []}
-            
-            data = response.json()
-            log_message(messages, f"📥 API Response status: OK")
-            
-            if "choices" not in data or not data["choices"]:
-                log_message(messages, f"✗ Response inválida: {str(data)[:200]}")
-                return {"success": False, "reason": "Invalid API response", "instructions": []}
-            
-            content = data["choices"][0]["message"]["content"]
+                    },
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": (
+                                "Analyze this job application screenshot. Decide if submission succeeded. "
+                                "If not, generate precise Playwright-friendly instructions using label-based selectors. "
+                                "ALWAYS provide values derived from the CV when a field is empty (e.g., job title, legal name, city, phone, email). "
+                                "Known fields: " + str(known_fields) + "\n\nCV Text (may be truncated):\n" + (cv_excerpt or "")
+                            )},
+                            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{screenshot_b64}", "detail": VISION_IMAGE_DETAIL}}
+                        ]
+                    }
+                ]
+            })
+        )
+        
+        if response.status_code != 200:
+            error_text = response.text
+            log_message(messages, f"✗ Vision API error: {response.status_code}")
+            log_message(messages, f"✗ Response: {error_text[:200]}")
+            return {"success": False, "reason": "API error", "instructions": []}
+        
+        data = orjson.loads(response.content)
+        log_message(messages, f"📥 API Response status: OK")
+        
+        if "choices" not in data or not data["choices"]:
+            log_message(messages, f"✗ Response inválida: {str(data)[:200]}")
+            return {"success": False, "reason": "Invalid API response", "instructions": []}
+        
+        content = data["choices"][0]["message"]["content"]
+        if DEBUG:
             log_message(messages, f"📄 Content recebido: {content[:100]}...")
+        
+        # Limpar markdown code blocks se existirem
+        content_clean = content.strip()
+        if content_clean.startswith("```json"):
+            content_clean = content_clean[7:]
+        if content_clean.startswith("```"):
+            content_clean = content_clean[3:]
+        if content_clean.endswith("```"):
+            content_clean = content_clean[:-3]
+        content_clean = content_clean.strip()
+        
+        # Parse JSON from response
+        try:
+            result = orjson.loads(content_clean)
+        except orjson.JSONDecodeError as e:
+            log_message(messages, f"✗ Erro JSON decode: {e}, tentando extrair com regex...")
+            # Fallback: tentar extrair JSON com regex
+            json_match = RE_JSON_OBJECT.search(content_clean)
+            if json_match:
+                result = orjson.loads(json_match.group(0))
+            else:
+                log_message(messages, f"✗ Não foi possível extrair JSON do conteúdo")
+                return {"success": False, "reason": "Failed to parse Vision response", "instructions": []}
+        
+        if result.get("success"):
+            log_message(messages, f"✓ Vision confirmou sucesso: {result.get('reason', '')}")
+        else:
+            log_message(messages, f"✗ Vision detectou falha: {result.get('reason', '')}")
+            instructions = result.get("instructions", [])
+            captcha_type = result.get("captcha_type")
+            captcha_prompt = result.get("captcha_prompt")
             
-            # Limpar markdown code blocks se existirem
-            content_clean = content.strip()
-            if content_clean.startswith("```json"):
-                content_clean = content_clean[7:]
-            if content_clean.startswith("```"):
-                content_clean = content_clean[3:]
-            if content_clean.endswith("```"):
-                content_clean = content_clean[:-3]
-            content_clean = content_clean.strip()
+            if captcha_type:
+                log_message(messages, f"🔐 CAPTCHA detectado: {captcha_type}")
+                if captcha_prompt:
+                    log_message(messages, f"   Prompt: {captcha_prompt}")
+                if captcha_type != "iframe":
+                    log_message(messages, "   Vision vai tentar resolver...")
             
-            # Parse JSON from response
-            import json
-            import re
-            try:
-                result = json.loads(content_clean)
-            except json.JSONDecodeError as e:
-                log_message(messages, f"✗ Erro JSON decode: {e}, tentando extrair com regex...")
-                # Fallback: tentar extrair JSON com regex
-                json_match = re.search(r'\{[\s\S]*\}', content_clean)
-                if json_match:
-                    result = json.loads(json_match.group(0))
-                else:
-                    log_message(messages, f"✗ Não foi possível extrair JSON do conteúdo")
-                    return {"success": False, "reason": "Failed to parse Vision response", "instructions": []}
-            
-            if result.get("success"):
-                log_message(messages, f"✓ Vision confirmou sucesso: {result.get('reason', '')}")
-            else:
-                log_message(messages, f"✗ Vision detectou falha: {result.get('reason', '')}")
-                instructions = result.get("instructions", [])
-                captcha_type = result.get("captcha_type")
-                captcha_prompt = result.get("captcha_prompt")
-                
-                if captcha_type:
-                    log_message(messages, f"🔐 CAPTCHA detectado: {captcha_type}")
-                    if captcha_prompt:
-                        log_message(messages, f"   Prompt: {captcha_prompt}")
-                    if captcha_type != "iframe":
-                        log_message(messages, "   Vision vai tentar resolver...")
-                
-                if instructions:
-                    log_message(messages, f"📋 Instruções recebidas: {len(instructions)} ações")
+            if instructions:
+                log_message(messages, f"📋 Instruções recebidas: {len(instructions)} ações")
+                if DEBUG:
                     for idx, inst in enumerate(instructions, 1):
                         log_message(messages, f"   {idx}. {inst}")
-            
-            return result
-            
+        
+        return result
+        
     except Exception as e:
         log_message(messages, f"✗ Erro ao analisar com Vision: {e}")
         return {"success": False, "reason": str(e), "instructions": []}
+    finally:
+        vision_semaphore.release()
 
 
+CAPTCHA_SUBMIT_SELECTOR = (
+    "button:has-text('Submit'), button:has-text('Verify'), "
+    "[class*='captcha'] button[type='submit'], .captcha-submit, #captcha-submit"
+    " >> visible=true"
+)
+
 async def execute_vision_instructions(page, instructions: List[object], messages: List[str]) -> bool:
     """
     Executa as instruções fornecidas pelo Vision.
@@ -1218,30 +1679,29 @@ async def execute_vision_instructions(page, instructions: List[object], messages
 
             # CAPTCHA image grid
             if "click captcha image at position" in lower:
-                match = re.search(r"position\s*\((\d+),\s*(\d+)\)", text)
+                match = RE_CAPTCHA_POS.search(text)
                 if match:
                     row, col = int(match.group(1)), int(match.group(2))
                     try:
                         cols_per_row = 3
                         image_index = (row - 1) * cols_per_row + col
-                        selectors = [
-                            f".captcha-grid img:nth-child({image_index})",
-                            f"[class*='captcha'] img:nth-child({image_index})",
-                            f"img[alt*='captcha']:nth-child({image_index})",
-                            f".rc-imageselect-tile:nth-child({image_index})",
-                        ]
+                        # Um só seletor composto: um round-trip em vez de um por variante
+                        compound = (
+                            f".captcha-grid img:nth-child({image_index}), "
+                            f"[class*='captcha'] img:nth-child({image_index}), "
+                            f"img[alt*='captcha']:nth-child({image_index}), "
+                            f".rc-imageselect-tile:nth-child({image_index})"
+                        )
                         clicked = False
-                        for sel in selectors:
-                            try:
-                                el = page.locator(sel).first
-                                if await el.count() > 0:
-                                    await el.click(timeout=2000)
-                                    log_message(messages, f"    ✓ Clicou CAPTCHA ({row},{col})")
-                                    clicked = True
-                                    executed_count += 1
-                                    break
-                            except Exception:
-                                continue
+                        try:
+                            el = page.locator(compound).first
+                            if await el.count() > 0:
+                                await el.click(timeout=2000)
+                                log_message(messages, f"    ✓ Clicou CAPTCHA ({row},{col})")
+                                clicked = True
+                                executed_count += 1
+                        except Exception:
+                            pass
                         if not clicked:
                             all_imgs = page.locator("img")
                             count = await all_imgs.count()
@@ -1255,28 +1715,17 @@ async def execute_vision_instructions(page, instructions: List[object], messages
 
             if "click captcha submit" in lower:
                 try:
-                    for sel in [
-                        "button:has-text('Submit')",
-                        "button:has-text('Verify')",
-                        "[class*='captcha'] button[type='submit']",
-                        ".captcha-submit",
-                        "#captcha-submit",
-                    ]:
-                        try:
-                            btn = page.locator(sel).first
-                            if await btn.is_visible(timeout=2000):
-                                await btn.click()
-                                log_message(messages, f"    ✓ Clicou submit CAPTCHA")
-                                executed_count += 1
-                                break
-                        except Exception:
-                            continue
+                    btn = page.locator(CAPTCHA_SUBMIT_SELECTOR).first
+                    if await btn.count() > 0:
+                        await btn.click()
+                        log_message(messages, f"    ✓ Clicou submit CAPTCHA")
+                        executed_count += 1
                 except Exception as e:
                     log_message(messages, f"    ✗ Falha ao clicar submit CAPTCHA: {e}")
                 continue
 
             if "select option" in lower and "dropdown" in lower:
-                match = re.search(r"select option ['\"](.+?)['\"] in dropdown\s*(?:\[name=['\"](.+?)['\"]\]|['\"](.+?)['\"])", text, re.IGNORECASE)
+                match = RE_SELECT_DROPDOWN.search(text)
                 if match:
                     option_value = match.group(1)
                     dropdown_name = match.group(2) or match.group(3)
@@ -1291,11 +1740,11 @@ async def execute_vision_instructions(page, instructions: List[object], messages
                         log_message(messages, f"    ✗ Falha ao selecionar dropdown: {e}")
 
             elif "fill" in lower:
-                match = re.search(r"fill\s+(.+?)\s+with\s+(?:value\s+)?['\"](.+?)['\"]", text, re.IGNORECASE)
+                match = RE_FILL.search(text)
                 if match:
                     selector_or_label, value = match.groups()
                     # se tiver aspas, assumir label
-                    quoted = re.search(r"['\"](.+?)['\"]", selector_or_label)
+                    quoted = RE_QUOTED.search(selector_or_label)
                     if quoted:
                         if await fill_by_label(quoted.group(1), value):
                             log_message(messages, f"    ✓ Preenchido por label: {quoted.group(1)}")
@@ -1305,10 +1754,10 @@ async def execute_vision_instructions(page, instructions: List[object], messages
                             executed_count += 1
 
             elif "click" in lower:
-                match = re.search(r"click\s+(.+)", text, re.IGNORECASE)
+                match = RE_CLICK.search(text)
                 if match:
                     target = match.group(1).strip()
-                    quoted = re.search(r"['\"](.+?)['\"]", target)
+                    quoted = RE_QUOTED.search(target)
                     if quoted:
                         if await click_by_name(quoted.group(1)):
                             executed_count += 1
@@ -1321,7 +1770,7 @@ async def execute_vision_instructions(page, instructions: List[object], messages
                             log_message(messages, f"    ✗ Falha ao clicar: {e}")
 
             elif "select" in lower:
-                match = re.search(r"select\s+(?:option\s+)?['\"](.+?)['\"]\s+in\s+(.+)", text, re.IGNORECASE)
+                match = RE_SELECT.search(text)
                 if match:
                     value, selector = match.groups()
                     try:
@@ -1332,10 +1781,10 @@ async def execute_vision_instructions(page, instructions: List[object], messages
                         log_message(messages, f"    ✗ Falha ao selecionar: {e}")
 
             elif "check" in lower:
-                match = re.search(r"check\s+(.+)", text, re.IGNORECASE)
+                match = RE_CHECK.search(text)
                 if match:
                     selector = match.group(1).strip()
-                    quoted = re.search(r"['\"](.+?)['\"]", selector)
+                    quoted = RE_QUOTED.search(selector)
                     if quoted:
                         if await check_by_label(quoted.group(1)):
                             log_message(messages, f"    ✓ Marcou checkbox por label: {quoted.group(1)}")
@@ -1407,33 +1856,89 @@ async def handle_platform_specific_fields(page, platform: str, user_data: Dict,
         except Exception:
             pass
 
-async def detect_success(page, job_url: str, messages: List[str]) -> bool:
+def success_from_state(state: Dict) -> Optional[bool]:
+    """False se há erros/pendências (prevalecem), True se há texto de sucesso, None se inconclusivo"""
+    hits = state["hits"]
+    if any(h in ERROR_HINTS for h in hits):
+        return False
+    if any(h in SUCCESS_HINTS for h in hits):
+        return True
+    return None
+
+SUBMIT_SETTLE_TIMEOUT_MS = 6000
+
+async def wait_submit_settled(page, submit_btn, messages: List[str], timeout: int = SUBMIT_SETTLE_TIMEOUT_MS) -> bool:
+    """Espera pelo efeito do clique no Submit: botão sai da página, URL muda ou o POST do formulário responde"""
+    start_url = page.url
+    waits = {
+        asyncio.create_task(submit_btn.wait_for(state="hidden", timeout=timeout)): "botão Submit saiu da página",
+        asyncio.create_task(page.wait_for_url(lambda u: u != start_url, timeout=timeout)): "URL mudou",
+        asyncio.create_task(page.wait_for_event(
+            "response",
+            predicate=lambda r: r.request.method in ("POST", "PUT") and r.request.resource_type in ("xhr", "fetch", "document"),
+            timeout=timeout,
+        )): "resposta do envio recebida",
+    }
+    pending = set(waits)
     try:
-        await page.wait_for_timeout(1200)
-        html = (await page.content()).lower()
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    log_debug(messages, "✓ Submit assentou: %s", waits[task])
+                    # Margem para o handler do envio atualizar o DOM
+                    await asyncio.sleep(0.2)
+                    return True
+    finally:
+        for task in pending:
+            task.cancel()
+    log_message(messages, "⚠ Nenhum sinal do envio %.0fs após o Submit", timeout / 1000)
+    return False
 
-        # Sinais de erro/pendência prevalecem
-        error_hits = [
-            "please fill out this field", "required", "fix the errors", "invalid"
-        ]
-        if any(h in html for h in error_hits):
+async def _wait_success_text(page) -> bool:
+    """Espera pela confirmação a aparecer em vez de um sleep fixo"""
+    try:
+        await page.get_by_text(RE_SUCCESS_HINTS).first.wait_for(state="visible", timeout=2000)
+        return True
+    except PwTimeout:
+        return False
+
+async def _wait_success_redirect(page, job_url: str) -> bool:
+    """URL mudou? Só conta se a nova página tiver confirmação de sucesso"""
+    try:
+        await page.wait_for_url(lambda u: u != job_url, timeout=2000)
+    except PwTimeout:
+        return False
+    return bool(await find_text_hits(page, SUCCESS_HINTS))
+
+async def detect_success(page, job_url: str, messages: List[str], state: Optional[Dict] = None) -> bool:
+    try:
+        if state is None:
+            state = await read_page_state(page)
+        verdict = success_from_state(state)
+        if verdict is False:
             log_message(messages, "⚠ Mensagens de erro/required ainda presentes")
             return False
-
-        # Sinais de sucesso explícitos
-        if any(h in html for h in SUCCESS_HINTS):
+        if verdict:
             log_message(messages, "✓ Texto de sucesso detectado")
             return True
 
-        # URL mudou? Só conta se nova página tiver confirmação de sucesso
+        # Texto de confirmação e redirect esperados em paralelo: o primeiro positivo ganha
+        checks = {
+            asyncio.create_task(_wait_success_text(page)): "✓ Texto de sucesso detectado",
+            asyncio.create_task(_wait_success_redirect(page, job_url)): "✓ Confirmação de sucesso após redirect",
+        }
+        pending = set(checks)
         try:
-            await page.wait_for_url(lambda u: u != job_url, timeout=2000)
-            new_html = (await page.content()).lower()
-            if any(h in new_html for h in SUCCESS_HINTS):
-                log_message(messages, "✓ Confirmação de sucesso após redirect")
-                return True
-        except PwTimeout:
-            pass
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result():
+                        log_message(messages, checks[task])
+                        return True
+        finally:
+            for task in pending:
+                task.cancel()
     except Exception as e:
         log_message(messages, f"⚠ Erro ao detectar sucesso: {e}")
     return False
@@ -1510,26 +2015,31 @@ async def detect_application_platform(page, messages: List[str]) -> Dict:
 # --------------------------
 # Core
 # --------------------------
-async def apply_to_job_async(user_data: Dict[str, str]) -> Dict:
-    messages: List[str] = []
+async def apply_to_job_async(user_data: Dict[str, str], messages: Optional[deque] = None) -> Dict:
+    # O chamador pode passar o log para ainda o ter se a candidatura for cancelada
+    if messages is None:
+        messages = new_log()
     app_state = ApplicationState()
     app_logger = ApplicationLogger()
-    t0 = time.time()
+    t0 = time.perf_counter_ns()
     job_url = user_data.get("job_url", "")
     plan_only = bool(user_data.get("plan_only", False))
     allow_submit = bool(user_data.get("allow_submit", True))
     openai_api_key = user_data.get("openai_api_key")
+    humanize = bool(user_data.get("humanize", True))
     
     # Inicializar variáveis de screenshot e estado
-    screenshot_b64 = ""
-    pre_submit_b64 = ""
-    post_submit_b64 = ""
+    error_type = None
+    # Screenshots ficam em bytes durante as tentativas; o base64 só é gerado na resposta
+    final_img = b""
+    pre_submit_img = b""
+    post_submit_img = b""
     ok = False
     status = "unknown"
 
     pdf_bytes = await load_resume_bytes(user_data.get("resume_url"), user_data.get("resume_b64"))
     if pdf_bytes:
-        extracted = extract_from_pdf_bytes(pdf_bytes)
+        extracted = await parse_resume(pdf_bytes)
         for k, v in extracted.items():
             user_data.setdefault(k, v)
         log_message(messages, f"✓ CV parse: {list(extracted.keys()) or 'nenhum'}")
@@ -1537,31 +2047,21 @@ async def apply_to_job_async(user_data: Dict[str, str]) -> Dict:
     required = ["job_url", "email"]
     missing = [f for f in required if not user_data.get(f)]
     if missing:
-        return {"ok": False, "status": "missing_fields", "missing": missing, "log": messages}
+        return {"ok": False, "status": "missing_fields", "missing": missing, "log": list(messages)}
 
     try:
-        async with async_playwright() as p:
-            # Argumentos anti-detecção de bot e CAPTCHA
-            browser = await p.chromium.launch(
-                headless=True,
-                args=[
-                    "--no-sandbox",
-                    "--disable-dev-shm-usage",
-                    "--disable-blink-features=AutomationControlled",
-                    "--disable-web-security",
-                    "--disable-features=IsolateOrigins,site-per-process",
-                    "--disable-infobars",
-                    "--window-size=1920,1080",
-                    "--start-maximized",
-                    "--disable-gpu"
-                ]
-            )
-            
-            context = await browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
-            
+        # Browser partilhado pelo processo; cada candidatura tem o seu contexto isolado
+        browser = await get_browser(messages)
+        context = await browser.new_context(
+            viewport={'width': 1920, 'height': 1080},
+            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        )
+        # Fecha só o contexto (o browser fica vivo para o próximo pedido) em qualquer saída,
+        # incluindo cancelamento por APPLY_TIMEOUT_S
+        async with contextlib.AsyncExitStack() as stack:
+            stack.push_async_callback(close_context, context)
+            if BLOCKED_RESOURCE_TYPES:
+                await context.route("**/*", block_heavy_resources)
             page = await context.new_page()
             page.set_default_timeout(15000)
             
@@ -1585,30 +2085,31 @@ async def apply_to_job_async(user_data: Dict[str, str]) -> Dict:
             """)
 
             log_message(messages, f"Iniciando candidatura: {job_url}")
-            step_start = time.time()
+            step_start = time.perf_counter()
             await page.goto(job_url, wait_until="domcontentloaded")
-            app_logger.log_performance("page_load", time.time() - step_start)
+            app_logger.log_performance("page_load", time.perf_counter() - step_start)
             app_state.current_step = "page_loaded"
             
             # 🎯 Detectar plataforma
-            step_start = time.time()
+            step_start = time.perf_counter()
             platform_info = await detect_application_platform(page, messages)
             app_state.platform_detected = platform_info["platform"]
-            app_logger.log_performance("platform_detection", time.time() - step_start)
+            app_logger.log_performance("platform_detection", time.perf_counter() - step_start)
             
             # 🎭 Comportamento humano: tempo de leitura inicial
-            await human_reading_behavior(page, messages)
-            await human_browsing_pattern(page, messages)
+            if humanize:
+                await human_reading_behavior(page, messages)
+                await human_browsing_pattern(page, messages)
             
-            timing = HumanTiming()
+            timing = HumanTiming(enabled=humanize)
             await timing.think("review")
             
             await try_open_apply_modal(page, messages)
             app_state.current_step = "form_opened"
             if pdf_bytes:
-                step_start = time.time()
+                step_start = time.perf_counter()
                 await upload_resume(page, pdf_bytes, messages)
-                app_logger.log_performance("cv_upload", time.time() - step_start)
+                app_logger.log_performance("cv_upload", time.perf_counter() - step_start)
                 app_state.filled_fields.add("resume")
 
             # Expandir secções colapsadas primeiro
@@ -1616,67 +2117,93 @@ async def apply_to_job_async(user_data: Dict[str, str]) -> Dict:
             app_state.current_step = "filling_form"
             
             # 🎭 Movimento de mouse humano
-            await human_mouse_movement(page, messages)
+            if humanize:
+                await human_mouse_movement(page, messages)
+
+            # Valores do utilizador lidos uma só vez (None/ausente -> "")
+            full_name = user_data.get("full_name") or ""
+            email = user_data.get("email") or ""
+            phone = user_data.get("phone") or ""
+            current_company = user_data.get("current_company") or ""
+            cloc_val = user_data.get("current_location") or ""
+            salary = user_data.get("salary_expectations") or ""
+            notice = user_data.get("notice_period") or ""
+            extra = user_data.get("additional_info") or ""
 
             # Preenchimento por label com comportamento humano
-            step_start = time.time()
-            if await fill_by_possible_labels(page, ["Full name", "Name", "Nome completo"], user_data.get("full_name", ""), messages, human=True):
+            step_start = time.perf_counter()
+            if await fill_by_possible_labels(page, ["Full name", "Name", "Nome completo"], full_name, messages, human=humanize):
                 app_state.filled_fields.add("full_name")
-            if await fill_by_possible_labels(page, ["Email", "E-mail"], user_data.get("email", ""), messages, human=True):
+            if await fill_by_possible_labels(page, ["Email", "E-mail"], email, messages, human=humanize):
                 app_state.filled_fields.add("email")
-            if await fill_by_possible_labels(page, ["Phone", "Mobile", "Telefone"], user_data.get("phone", ""), messages, human=True):
+            if await fill_by_possible_labels(page, ["Phone", "Mobile", "Telefone"], phone, messages, human=humanize):
                 app_state.filled_fields.add("phone")
-            app_logger.log_performance("basic_fields", time.time() - step_start)
+            app_logger.log_performance("basic_fields", time.perf_counter() - step_start)
 
-            filled_name = await fill_field(page, SELECTORS["full_name"], user_data.get("full_name", ""), messages)
-            if not filled_name and user_data.get("full_name"):
-                parts = user_data["full_name"].split(maxsplit=1)
+            filled_name = await fill_field(page, SELECTORS["full_name"], full_name, messages, human=humanize)
+            if not filled_name and full_name:
+                parts = full_name.split(maxsplit=1)
                 first = parts[0]
                 last = parts[1] if len(parts) > 1 else ""
-                await fill_field(page, SELECTORS["first_name"], first, messages)
-                await fill_field(page, SELECTORS["last_name"], last, messages)
+                await fill_field(page, SELECTORS["first_name"], first, messages, human=humanize)
+                await fill_field(page, SELECTORS["last_name"], last, messages, human=humanize)
 
-            await fill_field(page, SELECTORS["email"], user_data.get("email", ""), messages)
-            await fill_field(page, SELECTORS["phone"], user_data.get("phone", ""), messages)
+            if humanize:
+                await fill_field(page, SELECTORS["email"], email, messages)
+                await fill_field(page, SELECTORS["phone"], phone, messages)
+            else:
+                # Email + telefone num só evaluate (fills em paralelo partilhariam o foco do teclado
+                # e o insertText de um podia cair no outro); o que faltar segue por fill_field
+                values = {"email": email, "phone": phone}
+                for key in await fill_fields_batch(page, values, messages):
+                    await fill_field(page, SELECTORS[key], values[key], messages, human=False)
 
             # Location com autocomplete inteligente e comportamento humano
-            loc_val = user_data.get("location") or user_data.get("current_location", "")
+            loc_val = user_data.get("location") or cloc_val
             if loc_val:
-                timing = HumanTiming()
+                timing = HumanTiming(enabled=humanize)
                 await timing.think("complex_field")
                 if not await fill_autocomplete_location(page, loc_val, messages):
-                    if not await fill_by_possible_labels(page, ["Location", "City", "Location (City)"], loc_val, messages, human=True):
+                    if not await fill_by_possible_labels(page, ["Location", "City", "Location (City)"], loc_val, messages, human=humanize):
                         if not await fill_autocomplete(page, SELECTORS["location"], loc_val, messages):
-                            await fill_field(page, SELECTORS["location"], loc_val, messages, human=True)
+                            await fill_field(page, SELECTORS["location"], loc_val, messages, human=humanize)
 
             # Empresa atual com comportamento humano
-            timing = HumanTiming()
+            timing = HumanTiming(enabled=humanize)
             await timing.think("complex_field")
-            if not await fill_by_possible_labels(page, ["Current company", "Company", "Empresa atual"], user_data.get("current_company", ""), messages, human=True):
-                await fill_field(page, SELECTORS["current_company"], user_data.get("current_company", ""), messages, human=True)
+            if not await fill_by_possible_labels(page, ["Current company", "Company", "Empresa atual"], current_company, messages, human=humanize):
+                await fill_field(page, SELECTORS["current_company"], current_company, messages, human=humanize)
 
             # Localização atual
-            cloc_val = user_data.get("current_location", "")
             if cloc_val:
                 await timing.random_break()
-                if not await fill_by_possible_labels(page, ["Current location", "City", "Cidade"], cloc_val, messages, human=True):
+                if not await fill_by_possible_labels(page, ["Current location", "City", "Cidade"], cloc_val, messages, human=humanize):
                     if not await fill_autocomplete(page, SELECTORS["current_location"], cloc_val, messages):
-                        await fill_field(page, SELECTORS["current_location"], cloc_val, messages, human=True)
+                        await fill_field(page, SELECTORS["current_location"], cloc_val, messages, human=humanize)
+
+            # Sem humanização, salário/aviso/informação adicional vão num só evaluate;
+            # só os que não forem encontrados seguem para labels + fill_field
+            pending = {"salary", "notice", "additional"}
+            if not humanize:
+                pending = set(await fill_fields_batch(page, {"salary": salary, "notice": notice, "additional": extra}, messages))
 
             # Expectativas salariais
-            await timing.think("decision")
-            if not await fill_by_possible_labels(page, ["Salary", "Salary expectations", "Compensation", "Desired salary"], user_data.get("salary_expectations", ""), messages, human=True):
-                await fill_field(page, SELECTORS["salary"], user_data.get("salary_expectations", ""), messages, human=True)
+            if "salary" in pending:
+                await timing.think("decision")
+                if not await fill_by_possible_labels(page, ["Salary", "Salary expectations", "Compensation", "Desired salary"], salary, messages, human=humanize):
+                    await fill_field(page, SELECTORS["salary"], salary, messages, human=humanize)
 
             # Período de aviso / disponibilidade
-            await timing.random_break()
-            if not await fill_by_possible_labels(page, ["Notice period", "Availability", "Earliest start date", "Disponibilidade"], user_data.get("notice_period", ""), messages, human=True):
-                await fill_field(page, SELECTORS["notice"], user_data.get("notice_period", ""), messages, human=True)
+            if "notice" in pending:
+                await timing.random_break()
+                if not await fill_by_possible_labels(page, ["Notice period", "Availability", "Earliest start date", "Disponibilidade"], notice, messages, human=humanize):
+                    await fill_field(page, SELECTORS["notice"], notice, messages, human=humanize)
 
             # Informação adicional / carta de apresentação
-            await timing.think("decision")
-            if not await fill_by_possible_labels(page, ["Additional information", "Cover letter", "Notes", "Message", "Informação adicional"], user_data.get("additional_info", ""), messages, human=True):
-                await fill_field(page, SELECTORS["additional"], user_data.get("additional_info", ""), messages, human=True)
+            if "additional" in pending:
+                await timing.think("decision")
+                if not await fill_by_possible_labels(page, ["Additional information", "Cover letter", "Notes", "Message", "Informação adicional"], extra, messages, human=humanize):
+                    await fill_field(page, SELECTORS["additional"], extra, messages, human=humanize)
             
             # Campos específicos da plataforma
             await handle_platform_specific_fields(page, app_state.platform_detected, user_data, messages)
@@ -1684,9 +2211,9 @@ async def apply_to_job_async(user_data: Dict[str, str]) -> Dict:
             # Verificar e corrigir campos obrigatórios
             problems = await check_required_errors(page, messages)
             if problems:
-                await asyncio.sleep(0.8)
                 await autofix_required_fields(page, messages)
-                await asyncio.sleep(0.5)
+                # Re-verificar assim que a validação limpar, em vez de sleeps fixos
+                await wait_validation_settled(page)
                 problems = await check_required_errors(page, messages)
 
             if plan_only:
@@ -1695,10 +2222,18 @@ async def apply_to_job_async(user_data: Dict[str, str]) -> Dict:
                 # Self-healing loop com Vision AI (max 5 tentativas)
                 MAX_RETRIES = 5
                 retry_count = 0
+
+                # Os locators do Submit são lazy e não mudam entre tentativas: criados uma só vez
+                submit_role_btn = page.get_by_role("button", name=RE_SUBMIT).first
+                submit_strict_btn = page.locator(SELECTORS.get("submit_strict", SELECTORS["submit"]))
+                submit_any_btn = page.locator(SELECTORS["submit"]).first
                 
                 while retry_count < MAX_RETRIES:
                     retry_count += 1
-                    log_message(messages, f"🔄 Tentativa {retry_count}/{MAX_RETRIES}")
+                    log_message(messages, "🔄 Tentativa %d/%d", retry_count, MAX_RETRIES)
+                    # Backoff com jitter entre tentativas, antes de voltar a clicar no Submit
+                    if retry_count > 1:
+                        await asyncio.sleep(backoff_delay(retry_count - 1))
 
                     # Scroll para forçar render de campos lazy e expandir secções
                     try:
@@ -1730,9 +2265,10 @@ async def apply_to_job_async(user_data: Dict[str, str]) -> Dict:
                     # Consent/Privacy (não incluir reCAPTCHA por agora)
                     await try_click_privacy_consent(page, messages)
                     
-                    # Tentar resolver CAPTCHA com retry inteligente
+                    # Tentar resolver CAPTCHA com retry inteligente, só se houver um na página
+                    # (o retry_system espera 5s por tentativa)
                     captcha_attempt = 0
-                    while captcha_attempt < 3:
+                    while captcha_attempt < 3 and await has_captcha(page):
                         if await solve_captcha_improved(page, messages):
                             app_state.captcha_solved = True
                             log_message(messages, "✅ CAPTCHA resolvido")
@@ -1757,23 +2293,24 @@ async def apply_to_job_async(user_data: Dict[str, str]) -> Dict:
                         pass
                     
                     # 🎭 Scroll final para rever formulário (comportamento humano)
-                    try:
-                        await page.evaluate("window.scrollTo(0, 0)")
-                        await asyncio.sleep(random.uniform(0.8, 2.0))
-                        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                        timing = HumanTiming()
-                        await timing.think("review")
-                    except Exception:
-                        pass
+                    if humanize:
+                        try:
+                            await page.evaluate("window.scrollTo(0, 0)")
+                            await asyncio.sleep(random.uniform(0.8, 2.0))
+                            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                            timing = HumanTiming(enabled=humanize)
+                            await timing.think("review")
+                        except Exception:
+                            pass
 
                     # Clique robusto no Submit com comportamento humano
+                    submit_clicked = False
                     try:
-                        import re as _re
-                        submit_btn = page.get_by_role("button", name=_re.compile("submit", _re.I)).first
+                        submit_btn = submit_role_btn
                         if await submit_btn.count() == 0:
-                            submit_btn = page.locator(SELECTORS.get("submit_strict", SELECTORS["submit"]))
+                            submit_btn = submit_strict_btn
                         if await submit_btn.count() == 0:
-                            submit_btn = page.locator(SELECTORS["submit"]).first
+                            submit_btn = submit_any_btn
 
                         # Esperar que fique enabled e clicável
                         handle = await submit_btn.element_handle()
@@ -1786,28 +2323,33 @@ async def apply_to_job_async(user_data: Dict[str, str]) -> Dict:
                             await submit_btn.scroll_into_view_if_needed()
                             
                             # 📸 Screenshot PRE-SUBMIT
-                            pre_submit_b64 = ""
+                            pre_submit_img = b""
                             try:
-                                pre_png = await page.screenshot(full_page=True)
-                                pre_submit_b64 = base64.b64encode(pre_png).decode("utf-8")
-                                log_message(messages, "✓ Screenshot pré-submit capturado")
+                                pre_submit_img = await capture_screenshot(page)
+                                log_debug(messages, "✓ Screenshot pré-submit capturado")
                             except Exception as e:
                                 log_message(messages, f"⚠ Não foi possível capturar pré-submit: {e}")
                             
                             if allow_submit:
-                                # 🎭 Clique humano no submit
-                                timing = HumanTiming()
-                                await timing.think("review")
-                                
-                                # Tentar clique humano primeiro
-                                submit_selector = f"button:has-text('Submit')"
-                                if not await human_click(page, submit_selector, messages):
-                                    # Fallback para clique normal
+                                if humanize:
+                                    # 🎭 Clique humano no submit
+                                    timing = HumanTiming(enabled=humanize)
+                                    await timing.think("review")
+                                    
+                                    # Tentar clique humano primeiro
+                                    submit_selector = f"button:has-text('Submit')"
+                                    if not await human_click(page, submit_selector, messages):
+                                        # Fallback para clique normal
+                                        await submit_btn.click(timeout=5000)
+                                    log_message(messages, "✓ Clique em Submit (humano)")
+                                else:
                                     await submit_btn.click(timeout=5000)
+                                    log_message(messages, "✓ Clique em Submit")
                                 
-                                log_message(messages, "✓ Clique em Submit (humano)")
+                                submit_clicked = True
                             else:
                                 status = "awaiting_consent"
+                                final_img = pre_submit_img
                                 log_message(messages, "⚠ allow_submit=False — não submetido")
                                 break
                         else:
@@ -1817,27 +2359,74 @@ async def apply_to_job_async(user_data: Dict[str, str]) -> Dict:
                         app_logger.log_error("submit_click", str(e))
                         app_state.encountered_issues.append(f"submit_error: {str(e)}")
 
-                    await asyncio.sleep(2.0)
+                    # Última tentativa sem clique no Submit: a página não mudou, por isso
+                    # não vale a pena esperar, capturar screenshot nem chamar o Vision
+                    is_last = retry_count == MAX_RETRIES
+                    if is_last and not submit_clicked:
+                        ok = False
+                        status = "not_confirmed"
+                        log_message(messages, "✗ Não foi possível confirmar sucesso")
+                        break
+
+                    if submit_clicked:
+                        await wait_submit_settled(page, submit_btn, messages)
                     app_state.current_step = "submitted"
+
+                    # Verificação DOM barata primeiro: com confirmação já visível não há
+                    # screenshot para o Vision nem chamada à OpenAI
+                    quick_state = await read_page_state(page)
+                    if success_from_state(quick_state):
+                        ok = True
+                        status = "submitted"
+                        log_message(messages, "✓ Texto de sucesso detectado")
+                        log_message(messages, "🎉 Candidatura confirmada com sucesso!")
+                        # Evidência para o cliente (já fora do caminho crítico da deteção)
+                        try:
+                            post_submit_img = await capture_screenshot(page, full_page=False)
+                            final_img = post_submit_img
+                        except Exception:
+                            pass
+                        break
                     
                     # 📸 Screenshot POST-SUBMIT
-                    post_submit_b64 = ""
                     try:
-                        post_png = await page.screenshot(full_page=True)
-                        post_submit_b64 = base64.b64encode(post_png).decode("utf-8")
-                        screenshot_b64 = post_submit_b64  # manter compatibilidade
-                        log_message(messages, "✓ Screenshot pós-submit capturado")
+                        # Só o viewport: é o que o Vision analisa e reduz o payload várias vezes
+                        post_submit_img = await capture_screenshot(page, full_page=False, quality=VISION_SCREENSHOT_QUALITY)
+                        final_img = post_submit_img
+                        log_debug(messages, "✓ Screenshot pós-submit capturado")
                     except Exception as e:
                         log_message(messages, f"✗ Erro ao capturar screenshot pós-submit: {e}")
                         break
                     
-                    # Detectar sucesso com heurísticas básicas
-                    basic_success = await detect_success(page, job_url, messages)
-                    
-                    # Analisar com Vision AI (com contexto do CV e dados do utilizador)
-                    vision_result = await analyze_screenshot_with_vision(
-                        screenshot_b64, messages, openai_api_key, user_data.get("__text"), user_data
-                    )
+                    # Heurísticas básicas e Vision AI (com contexto do CV) em paralelo:
+                    # se a heurística confirmar sucesso primeiro, o Vision é cancelado
+                    basic_task = asyncio.create_task(detect_success(page, job_url, messages, state=quick_state))
+                    vision_task = None
+                    try:
+                        # Resize + JPEG do Pillow numa thread (liberta o GIL) enquanto a heurística corre
+                        vision_b64 = await asyncio.to_thread(prepare_vision_payload, post_submit_img) if openai_api_key else ""
+                        vision_task = asyncio.create_task(analyze_screenshot_with_vision(
+                            vision_b64, messages, openai_api_key, user_data.get("__text"), user_data
+                        ))
+                        done, _ = await asyncio.wait({basic_task, vision_task}, return_when=asyncio.FIRST_COMPLETED)
+                        if basic_task in done and basic_task.result():
+                            vision_task.cancel()
+                            log_message(messages, "✓ Heurística confirmou sucesso - Vision dispensado")
+                            basic_success = True
+                            vision_result = {"success": False, "instructions": []}
+                        else:
+                            vision_result = await vision_task
+                            if vision_result.get("success"):
+                                basic_task.cancel()
+                                basic_success = False
+                            else:
+                                basic_success = await basic_task
+                    finally:
+                        # Num cancelamento (ex: APPLY_TIMEOUT_S) nenhuma das tarefas pode ficar a correr
+                        # (o Vision seguraria um lugar do vision_semaphore com o contexto já fechado)
+                        for task in (basic_task, vision_task):
+                            if task is not None and not task.done():
+                                task.cancel()
                     
                     # Se Vision confirma sucesso OU heurística detectou
                     if vision_result.get("success") or basic_success:
@@ -1848,7 +2437,7 @@ async def apply_to_job_async(user_data: Dict[str, str]) -> Dict:
                     
                     # Se não foi sucesso e temos instruções do Vision
                     instructions = vision_result.get("instructions", [])
-                    if instructions and retry_count < MAX_RETRIES:
+                    if instructions and not is_last:
                         log_message(messages, f"🔧 Vision detectou problemas. A corrigir...")
                         await execute_vision_instructions(page, instructions, messages)
                         await asyncio.sleep(1.0)
@@ -1864,46 +2453,43 @@ async def apply_to_job_async(user_data: Dict[str, str]) -> Dict:
                     log_message(messages, f"⚠ Atingiu {MAX_RETRIES} tentativas sem sucesso confirmado")
                     status = "max_retries_reached"
 
-            # Screenshot final (se ainda não tirado)
-            if not screenshot_b64:
+            # Screenshot final só se nenhum ramo do loop deixou um (reaproveita o pré-submit)
+            if not final_img:
+                final_img = pre_submit_img
+            if not final_img:
                 try:
-                    png = await page.screenshot(full_page=True)
-                    screenshot_b64 = base64.b64encode(png).decode("utf-8")
-                    log_message(messages, "✓ Screenshot final capturado")
+                    final_img = await capture_screenshot(page, full_page=False)
+                    log_debug(messages, "✓ Screenshot final capturado")
                 except Exception:
                     pass
 
-            await browser.close()
-
     except Exception as e:
-        tb = traceback.format_exc()
-        log_message(messages, f"✗ ERRO CRÍTICO: {e}\n{tb}")
+        # Stack trace completo só no logger do servidor; a resposta leva tipo + mensagem
+        logger.exception("✗ ERRO CRÍTICO em %s", job_url)
+        error_type = type(e).__name__
+        log_message(messages, "✗ ERRO CRÍTICO: %s: %s", error_type, e)
         status = "error"
         ok = False
 
     # Calcular métricas finais
-    total_time = time.time() - app_logger.start_time
+    total_time = time.perf_counter() - app_logger.start_time
     app_logger.log_performance("total_execution", total_time)
     
-    elapsed = round(time.time() - t0, 2)
-    
-    # Garantir que temos as variáveis de screenshot
-    if 'pre_submit_b64' not in locals():
-        pre_submit_b64 = ""
-    if 'post_submit_b64' not in locals():
-        post_submit_b64 = screenshot_b64 if screenshot_b64 else ""
+    elapsed = (time.perf_counter_ns() - t0) // 10_000_000 / 100  # segundos, 2 casas
+    post_submit_b64 = encode_b64(post_submit_img or final_img)
     
     return {
         "ok": ok,
         "status": status,
         "job_url": job_url,
         "elapsed_s": elapsed,
+        "error_type": error_type,
         "platform": app_state.platform_detected or None,
-        "log": messages,
-        "screenshot": (post_submit_b64 or screenshot_b64 or ""),  # compat
+        "log": list(messages),
+        "screenshot": post_submit_b64,  # compat
         "evidence": {
-            "pre_submit_screenshot_b64": pre_submit_b64 or "",
-            "post_submit_screenshot_b64": post_submit_b64 or screenshot_b64 or ""
+            "pre_submit_screenshot_b64": encode_b64(pre_submit_img),
+            "post_submit_screenshot_b64": post_submit_b64
         },
         "state": app_state.to_dict(),
         "metrics": app_logger.performance_metrics,
@@ -1925,32 +2511,110 @@ def health():
 def healthz():
     return {"status": "ok"}
 
+def build_apply_payload(result: Dict) -> Dict:
+    """Normaliza o resultado de apply_to_job_async no formato esperado pelos clientes"""
+    payload = {
+        "ok": bool(result.get("ok")),
+        "status": result.get("status", "unknown"),
+        "platform": result.get("platform") or (result.get("state", {}) or {}).get("platform_detected"),
+        "evidence": result.get("evidence", {}),
+        "log": result.get("log", []),
+        "error": None
+    }
+    
+    # Se falhou, incluir erro e devolver só o fim do log (completo em /apply/log/{request_id})
+    if not payload["ok"] or payload["status"] in ("error", "failed"):
+        error_details = (result.get("errors") or {})
+        payload["error"] = error_details.get("fatal") or result.get("error") or "Auto-apply failed"
+        if result.get("error_type"):
+            payload["error_type"] = result["error_type"]
+        rid = store_failed_log(payload["log"])
+        payload["log"] = payload["log"][-FAILED_LOG_TAIL:]
+        payload["request_id"] = rid
+        payload["log_url"] = f"/apply/log/{rid}"
+    
+    return payload
+
+def request_fingerprint(req: ApplyRequest) -> str:
+    """Digest do que identifica a candidatura (vaga + candidato + modo)"""
+    # O CV e o nome entram na chave: pedidos só com CV (email extraído do PDF) chegam com
+    # email/phone vazios e não podem colidir entre candidatos diferentes
+    resume = hashlib.blake2b((req.resume_b64 or req.resume_url or "").encode("utf-8"), digest_size=16).hexdigest()
+    raw = "|".join([
+        req.job_url, req.email or "", req.phone or "", req.full_name or "", resume,
+        str(req.plan_only), str(req.allow_submit),
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def idempotency_conflict() -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail={"error": "Idempotency-Key já usada com outro pedido (job_url/candidato diferentes)"},
+    )
+
+async def _run_one(req: ApplyRequest, header_key: Optional[str] = None) -> Dict:
+    """Executa uma candidatura (com idempotência) respeitando o limite de concorrência do worker"""
+    # Formatação lazy: só constrói a string se o nível INFO estiver ativo
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("📥 Recebendo request para job: %s", req.job_url)
+        logger.info("📋 Dados: name=%s, email=%s, phone=%s", req.full_name, req.email, req.phone)
+    
+    # Com header a chave é do cliente, mas fica associada ao fingerprint do pedido:
+    # reutilizá-la para outra vaga/candidato dá 409 em vez de devolver o resultado de outro
+    fingerprint = request_fingerprint(req)
+    key = f"hdr:{header_key}" if header_key else fingerprint
+    cached = IDEMPOTENCY_CACHE.get(key)
+    if cached and time.monotonic() - cached[0] <= IDEMPOTENCY_TTL_S:
+        if cached[1] != fingerprint:
+            raise idempotency_conflict()
+        logger.info("♻️ Resultado em cache para job: %s", req.job_url)
+        return cached[2]
+    
+    # Mesmo pedido ainda a correr: esperar pelo resultado em vez de candidatar duas vezes
+    inflight = INFLIGHT_APPLIES.get(key)
+    if inflight:
+        if inflight[0] != fingerprint:
+            raise idempotency_conflict()
+        logger.info("⏳ Pedido duplicado em curso para job: %s", req.job_url)
+        return await asyncio.shield(inflight[1])
+    
+    task = asyncio.ensure_future(_apply_once(req))
+    INFLIGHT_APPLIES[key] = (fingerprint, task)
+    try:
+        payload = await task
+    finally:
+        INFLIGHT_APPLIES.pop(key, None)
+    
+    if payload["ok"]:
+        cache_apply_result(key, fingerprint, payload)
+    return payload
+
+async def _apply_once(req: ApplyRequest) -> Dict:
+    messages = new_log()
+    async with apply_semaphore:
+        # exclude_none: campos null passam a usar os defaults de user_data.get(...)
+        try:
+            result = await asyncio.wait_for(apply_to_job_async(req.model_dump(exclude_none=True), messages), APPLY_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            logger.warning("⏱ Candidatura excedeu %ss: %s", APPLY_TIMEOUT_S, req.job_url)
+            log_message(messages, "⏱ Prazo de %gs excedido - candidatura cancelada", APPLY_TIMEOUT_S)
+            result = {
+                "ok": False,
+                "status": "timeout",
+                "job_url": req.job_url,
+                "error": f"Apply exceeded {APPLY_TIMEOUT_S:g}s",
+                "error_type": "TimeoutError",
+                "log": list(messages),
+            }
+    
+    logger.info("✅ Resultado: status=%s, ok=%s", result.get("status"), result.get("ok"))
+    
+    return build_apply_payload(result)
+
 @app.post("/apply")
-async def auto_apply(req: ApplyRequest):
+async def auto_apply(req: ApplyRequest, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
     try:
-        logger.info(f"📥 Recebendo request para job: {req.job_url}")
-        logger.info(f"📋 Dados: name={req.full_name}, email={req.email}, phone={req.phone}")
-        
-        result = await apply_to_job_async(req.dict())
-        
-        logger.info(f"✅ Resultado: status={result.get('status')}, ok={result.get('ok')}")
-        
-        # Normalizar resposta no formato esperado
-        payload = {
-            "ok": bool(result.get("ok")),
-            "status": result.get("status", "unknown"),
-            "platform": result.get("platform") or (result.get("state", {}) or {}).get("platform_detected"),
-            "evidence": result.get("evidence", {}),
-            "log": result.get("log", []),
-            "error": None
-        }
-        
-        # Se falhou, incluir erro
-        if not payload["ok"] or payload["status"] in ("error", "failed"):
-            error_details = (result.get("errors") or {})
-            payload["error"] = error_details.get("fatal") or result.get("error") or "Auto-apply failed"
-        
-        return payload
+        return await _run_one(req, idempotency_key)
     except HTTPException:
         raise
     except Exception as e:
@@ -1965,3 +2629,36 @@ async def auto_apply(req: ApplyRequest):
                 "type": type(e).__name__
             }
         )
+
+@app.post("/apply/batch")
+async def auto_apply_batch(req: BatchRequest):
+    """Executa várias candidaturas em paralelo (limitadas por APPLY_CONCURRENCY; tamanho validado no BatchRequest)"""
+    results = await asyncio.gather(*[_run_one(r) for r in req.requests], return_exceptions=True)
+    
+    out = []
+    for i, res in enumerate(results):
+        if isinstance(res, BaseException):
+            logger.error("❌ Batch item %d falhou: %s: %s", i, type(res).__name__, res)
+            out.append({"id": i, "status": 500, "body": {"error": str(res), "type": type(res).__name__}})
+        else:
+            out.append({"id": i, "status": 200, "body": res})
+    return out
+
+@app.get("/apply/log/{rid}")
+def apply_log(rid: str):
+    entry = FAILED_LOGS.get(rid)
+    if not entry or time.monotonic() - entry[0] > FAILED_LOG_TTL_S:
+        FAILED_LOGS.pop(rid, None)
+        raise HTTPException(status_code=404, detail={"error": "Log não encontrado ou expirado"})
+    return {"request_id": rid, "log": entry[1]}
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8080")),
+        loop="uvloop",
+        http="httptools",
+        workers=WEB_CONCURRENCY,
+    )